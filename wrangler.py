@@ -1,11 +1,36 @@
-import os, sys, re, csv, json, subprocess, tempfile, pathlib, datetime
-from collections import defaultdict
+import os, sys, re, csv, json, subprocess, tempfile, pathlib, datetime, functools, hashlib, asyncio, contextlib, atexit
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+try:
+    import orjson  # optional: much faster parse/dump for the prompt and cache blobs
+except ImportError:
+    orjson = None
 
 # -------------------- CONFIG --------------------
 GEMINI_CMD = os.environ.get("GEMINI_CMD", "gemini")     
 GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")  
+CACHE_DIR = pathlib.Path(os.environ.get("WRANGLER_CACHE_DIR", "out/.cache"))
+PDF_CACHE_PATH = pathlib.Path("out/.pdf_cache.json")  # pdf -> {stamp, rows}; skips unchanged PDFs
+GEMINI_CONCURRENCY = int(os.environ.get("GEMINI_CONCURRENCY", "16"))  # max in-flight LLM requests
+SELFCHECK_MIN_CONFIDENCE = 0.7  # extractions at/above this with unambiguous dates skip the self-check call
+
+_PAGES_RE = re.compile(r"Pages:\s+(\d+)")
+_JSON_ARRAY_RE = re.compile(r"\[.*\]", re.DOTALL)
+_REL_TF_RE = re.compile(r"in\s+(\d+)\s+(day|week|month|year)s?", re.I)
+_SPACES_RE = re.compile(r"\s+")
+_UNIT = {"day": "days", "week": "weeks", "month": "months", "year": "years"}
 
 # -------------------- HELPERS --------------------
+def json_loads(s):
+    return orjson.loads(s) if orjson else json.loads(s)
+
+def json_dumps(obj, indent=False):
+    """Serialize to str via orjson when installed, stdlib json otherwise."""
+    if orjson:
+        opts = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=opts).decode("utf-8")
+    return json.dumps(obj, indent=2 if indent else None)
+
 def run(cmd, input_text=None):
     """Run a shell command; optionally provide STDIN text; return stdout string."""
     res = subprocess.run(cmd, input=input_text.encode("utf-8") if input_text else None,
@@ -14,31 +39,88 @@ def run(cmd, input_text=None):
         raise RuntimeError(f"Command failed: {' '.join(cmd)}\n{res.stderr.decode('utf-8','ignore')}")
     return res.stdout.decode("utf-8", "ignore")
 
+def write_atomic(path, text):
+    """Write via temp file + rename so readers never see a half-written file."""
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+_LOOP = {}  # pid -> the one event loop this process runs every coroutine on
+
+def _close_loop(loop):
+    if not loop.is_closed():
+        loop.run_until_complete(loop.shutdown_default_executor())
+        loop.close()
+
+def run_async(coro):
+    """Run `coro` on a per-process persistent loop. asyncio.run would start a fresh loop per
+    PDF / QA question, but the Gemini SDK's async client stays bound to the first loop.
+    Anything still pending afterwards is cancelled so nothing leaks into the next run."""
+    loop = _LOOP.get(os.getpid())
+    if loop is None or loop.is_closed():
+        loop = _LOOP[os.getpid()] = asyncio.new_event_loop()
+        atexit.register(_close_loop, loop)
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        pending = asyncio.all_tasks(loop)
+        for t in pending:
+            t.cancel()
+        if pending:
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+
+async def aenumerate(aiterable, start=0):
+    i = start
+    async for x in aiterable:
+        yield i, x
+        i += 1
+
 def pdf_pages(pdf_path):
     out = run(["pdfinfo", pdf_path])
-    m = re.search(r"Pages:\s+(\d+)", out)
+    m = _PAGES_RE.search(out)
     return int(m.group(1)) if m else 1
 
-def extract_page_text_or_image(pdf_path, page_idx):
-    """Try text extraction; if too short, render PNG + OCR. Returns: (text, image_path_or_None)"""
-    txt = run(["pdftotext", "-f", str(page_idx), "-l", str(page_idx), pdf_path, "-"])
-    if len(txt.strip()) >= 180:
-        return txt, None
-    # fallback: image + OCR
-    tmpdir = tempfile.gettempdir()
-    stem = pathlib.Path(pdf_path).stem
-    base = os.path.join(tmpdir, f"{stem}-p{page_idx}")
-    run(["pdftoppm", "-f", str(page_idx), "-l", str(page_idx), "-png", pdf_path, base])
-    img_path = f"{base}-1.png"
-    ocr = run(["tesseract", img_path, "stdout"])
-    return (ocr if len(ocr.strip())>0 else ""), img_path
-
-# -------------------- GEMINI VIA CLI --------------------
+def run_pipe(producer, consumer):
+    """Run `producer | consumer` without touching disk; return consumer stdout string."""
+    # producer stderr goes to a temp file: an unread PIPE fills up on noisy (damaged) PDFs and
+    # blocks the producer, which then never closes stdout and the consumer waits forever
+    with tempfile.TemporaryFile() as src_errf:
+        src = subprocess.Popen(producer, stdout=subprocess.PIPE, stderr=src_errf)
+        dst = subprocess.Popen(consumer, stdin=src.stdout, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        src.stdout.close()  # let producer see SIGPIPE if consumer exits early
+        out, err = dst.communicate()
+        src.wait()
+        src_errf.seek(0)
+        src_err = src_errf.read()
+    for cmd, proc, msg in ((producer, src, src_err), (consumer, dst, err)):
+        if proc.returncode != 0:
+            raise RuntimeError(f"Command failed: {' '.join(cmd)}\n{msg.decode('utf-8','ignore')}")
+    return out.decode("utf-8", "ignore")
+
+MIN_TEXT_CHARS = 180  # pages with less native text than this are OCR'd instead
+
+def extract_all_pages_text(pdf_path, n):
+    """Native text for all `n` pages from one pdftotext run (pages are separated by form feeds)."""
+    pages = run(["pdftotext", pdf_path, "-"]).split("\f")[:n]
+    return pages + [""] * (n - len(pages))
+
+def ocr_page(pdf_path, page_idx):
+    """Render one page and OCR it; pdftocairo streams the PNG straight into tesseract (no temp file)."""
+    ocr = run_pipe(["pdftocairo", "-png", "-r", "300", "-singlefile",
+                    "-f", str(page_idx), "-l", str(page_idx), pdf_path, "-"],
+                   ["tesseract", "-", "stdout"])
+    return ocr if len(ocr.strip())>0 else ""
+
+# -------------------- GEMINI (SDK, CLI fallback) --------------------
 
 EXTRACT_SYSTEM = """You are a clinical extraction assistant. From PAGE_TEXT, extract only incidental findings and explicit follow-up recommendations.
+PAGE_TEXT may hold several pages, each starting with a '=== PAGE N ===' marker.
 Return STRICT JSON array; keys exactly:
 [
  {
+  "page": N (integer, the PAGE marker the item came from),
   "patient_id": "string or null",
   "report_date": "YYYY-MM-DD or null",
   "modality": "CT|XR|MRI|US|Other",
@@ -63,51 +145,225 @@ SELF_CHECK_SYSTEM = """Validate and normalize the JSON list against PAGE_TEXT:
 - Normalize dates to YYYY-MM-DD.
 - If timeframe present but due_by missing and report_date present, compute due_by.
 - If confidence < 0.5 set priority=low.
+- Keep each item's "page" matching the '=== PAGE N ===' marker it came from.
 Output STRICT JSON array with the same keys. No prose.
 """
 
-def gemini_extract(page_text, page_image_hint=None):
-    # We ground on text (OCR/text-native). If there's an image file, we declare its presence in the prompt as a hint.
-    hint = f"\n[SCANNED_PAGE_IMAGE_PATH]: {page_image_hint}" if page_image_hint else ""
-    full_prompt = EXTRACT_SYSTEM + "\n---\nPAGE_TEXT:\n" + (page_text or "")[:8000] + hint
-    out = run([GEMINI_CMD, "-m", GEMINI_MODEL, "-p", full_prompt])
-    return out
+PAGE_TOKEN_BUDGET = 2500  # max tokens of PAGE_TEXT per Gemini call
+CHARS_PER_TOKEN = 4       # estimate used when tiktoken is not installed
+
+@functools.cache
+def tokenizer():
+    """cl100k_base encoder, or None if tiktoken is unavailable (-> char-based estimate)."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+def truncate_tokens(text, limit):
+    """Cut `text` to at most `limit` tokens; returns (text, token_count)."""
+    enc = tokenizer()
+    if enc is None:
+        text = text[:limit * CHARS_PER_TOKEN]
+        return text, -(-len(text) // CHARS_PER_TOKEN)
+    toks = enc.encode(text, disallowed_special=())  # page text is untrusted; '<|endoftext|>' is just text
+    if len(toks) <= limit:
+        return text, len(toks)
+    return enc.decode(toks[:limit]), limit
+
+EDGE_LINES = 3  # header/footer candidates come from the first/last lines of each page
+
+def page_lines(text):
+    """Non-empty lines with runs of whitespace collapsed."""
+    return [l for l in (_SPACES_RE.sub(" ", l).strip() for l in (text or "").splitlines()) if l]
+
+def boilerplate_lines(texts):
+    """Running headers/footers: lines sitting in the top/bottom EDGE_LINES of most pages.
+    Section labels ('IMPRESSION:') are never treated as boilerplate."""
+    pages = [page_lines(t) for t in texts]
+    pages = [ls for ls in pages if ls]
+    if len(pages) < 2:
+        return frozenset()
+    counts = defaultdict(int)
+    for ls in pages:
+        for line in set(ls[:EDGE_LINES] + ls[-EDGE_LINES:]):
+            counts[line] += 1
+    return frozenset(line for line, c in counts.items()
+                     if c >= 2 and c * 2 > len(pages) and not line.endswith(":"))
+
+def clean_page_text(text, boilerplate, seen):
+    """Collapse whitespace and drop boilerplate lines already in `seen` (one set per chunk, so
+    every Gemini call still gets the header with the patient id / report date once)."""
+    out = []
+    for line in page_lines(text):
+        if line in boilerplate:
+            if line in seen:
+                continue
+            seen.add(line)
+        out.append(line)
+    return "\n".join(out)
+
+async def chunk_pages(pages, boilerplate=frozenset(), budget=PAGE_TOKEN_BUDGET):
+    """Group an async stream of (page_idx, text) into consecutive chunks whose cleaned text fits in
+    `budget` tokens; each chunk is yielded as soon as it is full."""
+    cur, size, seen = [], 0, set()
+    async for p, text in pages:
+        page_seen = set(seen)
+        cleaned, n_tokens = truncate_tokens(clean_page_text(text, boilerplate, page_seen), budget)
+        if cur and size + n_tokens > budget:
+            yield cur
+            # new chunk: re-clean so its first page keeps the header lines
+            cur, size, page_seen = [], 0, set()
+            cleaned, n_tokens = truncate_tokens(clean_page_text(text, boilerplate, page_seen), budget)
+        seen = page_seen
+        cur.append((p, cleaned)); size += n_tokens
+    if cur: yield cur
+
+def format_pages(pages):
+    return "\n".join(f"=== PAGE {p} ===\n{text}" for p, text in pages)
+
+@functools.cache
+def genai_model():
+    """In-process google-generativeai model, or None if the SDK / API key is unavailable (-> CLI).
+    Only ever awaited on the process's run_async loop."""
+    api_key = os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
+    if not api_key:
+        return None
+    try:
+        import google.generativeai as genai
+    except ImportError:
+        return None
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(GEMINI_MODEL)
+
+async def gemini_generate(full_prompt, sem=None):
+    """One Gemini request: async SDK call when available, else the CLI in a worker thread."""
+    async with (sem or asyncio.Semaphore(1)):
+        model = genai_model()
+        if model is not None:
+            resp = await model.generate_content_async(full_prompt)
+            return resp.text
+        return await asyncio.to_thread(run, [GEMINI_CMD, "-m", GEMINI_MODEL, "-p", full_prompt])
+
+_GEMINI_MEMO = {}
 
-def gemini_selfcheck(candidate_json, page_text):
-    full_prompt = SELF_CHECK_SYSTEM + "\n---\nPAGE_TEXT:\n" + (page_text or "")[:8000] + "\n---\nCANDIDATE_JSON:\n" + (candidate_json or "")[:8000]
-    out = run([GEMINI_CMD, "-m", GEMINI_MODEL, "-p", full_prompt])
+async def gemini_cached(full_prompt, sem=None):
+    """gemini_generate, memoized in-process and on disk under CACHE_DIR keyed by (model, prompt)."""
+    key = hashlib.blake2b((GEMINI_MODEL + "\0" + full_prompt).encode("utf-8")).hexdigest()
+    if key in _GEMINI_MEMO:
+        return _GEMINI_MEMO[key]
+    path = CACHE_DIR / f"{key}.json"
+    try:
+        out = json_loads(path.read_bytes())["response"]
+    except (OSError, ValueError, KeyError):
+        out = None
+    if parse_json_array(out) is None:
+        out = await gemini_generate(full_prompt, sem)
+        # only well-formed answers are kept; a transient bad reply must not be replayed on reruns
+        if parse_json_array(out) is None:
+            return out
+        write_atomic(path, json_dumps({"model": GEMINI_MODEL, "response": out}))
+    _GEMINI_MEMO[key] = out
     return out
 
-def safe_json_loads(s):
+def build_prompt(system, **sections):
+    """Static system text always leads so Gemini's implicit prefix cache can reuse it across calls;
+    everything that varies per call goes after it."""
+    return system + "".join(f"\n---\n{name}:\n{body}" for name, body in sections.items())
+
+async def gemini_extract(pages, sem=None):
+    # One call per chunk of pages; the model tags each item with its page marker.
+    return await gemini_cached(build_prompt(EXTRACT_SYSTEM, PAGE_TEXT=format_pages(pages)), sem)
+
+async def gemini_selfcheck(candidate_json, pages, sem=None):
+    # CANDIDATE_JSON is the model's own output for this (token-budgeted) chunk and is sent whole:
+    # cutting it mid-item would make the self-check silently drop the trailing items
+    return await gemini_cached(build_prompt(SELF_CHECK_SYSTEM, PAGE_TEXT=format_pages(pages),
+                                            CANDIDATE_JSON=candidate_json or "[]"), sem)
+
+def parse_json_array(s):
+    """The JSON array in a model reply (bare or wrapped in prose/fences), or None if there is none."""
     try:
-        return json.loads(s)
+        v = json_loads(s)
     except Exception:
-        m = re.search(r"(\[.*\])", s or "", re.DOTALL)
-        if m:
-            try: return json.loads(m.group(1))
-            except Exception: return []
-        return []
+        m = _JSON_ARRAY_RE.search(s or "")
+        try: v = json_loads(m.group(0)) if m else None
+        except Exception: v = None
+    return v if isinstance(v, list) else None
+
+def safe_json_loads(s):
+    return parse_json_array(s) or []
+
+def needs_selfcheck(items):
+    """False when every item is confident and its due date is present (ISO) or absent-by-design /
+    derivable by add_relative_due_by; such batches skip the second Gemini call."""
+    for r in items:
+        if not isinstance(r, dict):
+            return True
+        try:
+            if float(r.get("confidence") or 0) < SELFCHECK_MIN_CONFIDENCE:
+                return True
+        except (TypeError, ValueError):
+            return True
+        if r.get("due_by"):
+            try: datetime.date.fromisoformat(str(r["due_by"]))
+            except ValueError: return True
+        elif r.get("timeframe") and not _REL_TF_RE.search(str(r["timeframe"])):
+            return True
+    return False
 
 # -------------------- NORMALIZATION --------------------
+@functools.cache
+def _dateutil():
+    """(dateutil.parser, relativedelta) imported on first use so --qa never pays for it;
+    None if dateutil is not installed (optional, like pandas)."""
+    try:
+        from dateutil import parser as dtp
+        from dateutil.relativedelta import relativedelta
+    except ImportError:
+        return None
+    return dtp, relativedelta
+
+def _fast_parse_date(s):
+    """YYYY-MM-DD (what the prompts ask for) via fromisoformat; anything else via dateutil."""
+    s = str(s)
+    try:
+        return datetime.date.fromisoformat(s[:10])
+    except ValueError:
+        du = _dateutil()
+        if du is None:
+            raise
+        return du[0].parse(s).date()
+
 def add_relative_due_by(row):
     if row.get("due_by") or not row.get("timeframe") or not row.get("report_date"):
         return row
     tf = str(row["timeframe"])
     try:
-        base = dtp.parse(row["report_date"]).date()
+        base = _fast_parse_date(row["report_date"])
     except Exception:
         return row
-    m = re.search(r"in\s+(\d+)\s+(day|week|month|year)s?", tf, re.I)
+    m = _REL_TF_RE.search(tf)
     if not m: return row
     n, unit = int(m.group(1)), m.group(2).lower()
-    if unit == "day": due = base + relativedelta(days=n)
-    elif unit == "week": due = base + relativedelta(weeks=n)
-    elif unit == "month": due = base + relativedelta(months=n)
-    else: due = base + relativedelta(years=n)
+    if unit in ("day", "week"):
+        due = base + datetime.timedelta(**{_UNIT[unit]: n})
+    else:
+        du = _dateutil()
+        if du is None: return row  # calendar months/years need relativedelta
+        due = base + du[1](**{_UNIT[unit]: n})
     row["due_by"] = due.isoformat()
     return row
 
-def normalize_row(r, pdf, page):
+def _as_confidence(x, default=0.5):
+    try:
+        return float(x or default)
+    except (TypeError, ValueError):
+        return default  # e.g. the model wrote "high"
+
+def normalize_row(r, pdf, page=None):
+    """`page` is only a fallback for items the model returned without a page number."""
     row = {
         "patient_id": r.get("patient_id"),
         "report_date": r.get("report_date"),
@@ -117,44 +373,43 @@ def normalize_row(r, pdf, page):
         "recommended_followup": r.get("recommended_followup"),
         "timeframe": r.get("timeframe"),
         "due_by": r.get("due_by"),
-        "priority": (r.get("priority") or "low").lower(),
+        "priority": str(r.get("priority") or "low").lower(),
         "source_pdf": pathlib.Path(pdf).name,
-        "page": page,
-        "confidence": float(r.get("confidence") or 0.5),
+        "page": r.get("page") or page,
+        "confidence": _as_confidence(r.get("confidence")),
     }
     return add_relative_due_by(row)
 
-def append_rows(csv_path, rows):
-    with open(csv_path, "a", newline="") as f:
-        w = csv.writer(f)
-        for r in rows:
-            w.writerow([
-                r["patient_id"] or "",
-                r["report_date"] or "",
-                r["modality"],
-                r["body_part"],
-                r["finding"],
-                r["recommended_followup"] or "",
-                r["timeframe"] or "",
-                r["due_by"] or "",
-                r["priority"],
-                r["source_pdf"],
-                r["page"],
-                f"{float(r['confidence']):.2f}",
-            ])
+def append_rows(writer, rows):
+    """Write rows in bulk through a csv.writer owned by the caller (one open handle per sweep)."""
+    writer.writerows((
+        r["patient_id"] or "",
+        r["report_date"] or "",
+        r["modality"],
+        r["body_part"],
+        r["finding"],
+        r["recommended_followup"] or "",
+        r["timeframe"] or "",
+        r["due_by"] or "",
+        r["priority"],
+        r["source_pdf"],
+        r["page"],
+        f"{float(r['confidence']):.2f}",
+    ) for r in rows)
 
 def write_summary_md(pdf_name, rows):
     outp = pathlib.Path("out/summaries") / (pathlib.Path(pdf_name).stem + ".md")
-    lines = [f"# Summary for {pdf_name}", ""]
+    # header + 3 lines per row (or the single "none found" line), filled by index
+    lines = [None] * (2 + (3 * len(rows) or 1))
+    lines[0], lines[1] = f"# Summary for {pdf_name}", ""
     if not rows:
-        lines.append("_No incidental findings with follow-up found._")
-    for r in rows:
-        lines += [
-            f"- **Page {r['page']} ({r['modality']} • {r['body_part']})**: {r['finding']}",
-            f"  - Follow-up: {r['recommended_followup'] or '—'}",
-            f"  - Timeframe: {r['timeframe'] or '—'}  •  Due by: {r['due_by'] or '—'}  •  Priority: {r['priority']}  •  Confidence: {r['confidence']:.2f}",
-        ]
-    outp.write_text("\n".join(lines))
+        lines[2] = "_No incidental findings with follow-up found._"
+    for i, r in enumerate(rows):
+        j = 2 + 3 * i
+        lines[j] = f"- **Page {r['page']} ({r['modality']} • {r['body_part']})**: {r['finding']}"
+        lines[j+1] = f"  - Follow-up: {r['recommended_followup'] or '—'}"
+        lines[j+2] = f"  - Timeframe: {r['timeframe'] or '—'}  •  Due by: {r['due_by'] or '—'}  •  Priority: {r['priority']}  •  Confidence: {r['confidence']:.2f}"
+    outp.write_bytes("\n".join(lines).encode("utf-8"))
 
 def aggregate_dashboard(csv_path):
     stats = {"total_rows":0,"due_within_30":0,"by_priority":{},"by_modality":{}}
@@ -162,46 +417,170 @@ def aggregate_dashboard(csv_path):
         import pandas as pd
         df = pd.read_csv(csv_path)
         stats["total_rows"] = int(df.shape[0])
-        today = datetime.date.today()
-        def within_30(x):
-            try:
-                d = dtp.parse(str(x)).date()
-                delta = (d - today).days
-                return -365 <= delta <= 30
-            except Exception:
-                return False
         if "due_by" in df.columns:
-            stats["due_within_30"] = int(df["due_by"].apply(within_30).sum())
+            # vectorized: unparseable/blank dates become NaT, whose NaN deltas fail both comparisons
+            dues = pd.to_datetime(df["due_by"], errors="coerce").dt.normalize()
+            delta = (dues - pd.Timestamp(datetime.date.today())).dt.days
+            stats["due_within_30"] = int(((delta >= -365) & (delta <= 30)).sum())
         stats["by_priority"] = df["priority"].value_counts(dropna=False).to_dict() if "priority" in df.columns else {}
         stats["by_modality"] = df["modality"].value_counts(dropna=False).to_dict() if "modality" in df.columns else {}
     except Exception:
         pass
-    pathlib.Path("out/risk_dashboard.json").write_text(json.dumps(stats, indent=2))
+    pathlib.Path("out/risk_dashboard.json").write_text(json_dumps(stats, indent=True))
 
 # -------------------- PIPELINE --------------------
-def process_pdf(pdf_path):
+async def page_texts(pdf_path, texts, pool):
+    """Yield (page_idx, text) in page order. Text-native pages pass straight through; short pages
+    are OCR'd in `pool`, all submitted up front so they run while earlier chunks are at Gemini."""
+    loop = asyncio.get_running_loop()
+    ocr = {} if pool is None else {
+        p: loop.run_in_executor(pool, ocr_page, pdf_path, p)
+        for p, text in enumerate(texts, start=1) if len(text.strip()) < MIN_TEXT_CHARS}
+    for p, text in enumerate(texts, start=1):
+        yield p, (await ocr[p] if p in ocr else text)
+
+async def process_pdf_async(pdf_path, ocr_workers=None, llm_concurrency=None):
+    """OCR -> extract -> self-check as a queue pipeline: CPU-bound OCR of later pages overlaps the
+    network-bound Gemini calls for earlier chunks."""
+    ocr_workers = ocr_workers or os.cpu_count() or 1
+    n_workers = max(1, llm_concurrency or GEMINI_CONCURRENCY)
     n = pdf_pages(pdf_path)
-    all_rows = []
-    for p in range(1, n+1):
-        text, img = extract_page_text_or_image(pdf_path, p)
-        # 1) extraction via gemini CLI
-        raw = gemini_extract(text, img)
-        items = safe_json_loads(raw)
-        # 2) self-check normalization
-        checked_raw = gemini_selfcheck(json.dumps(items), text)
-        checked = safe_json_loads(checked_raw)
-        for r in checked:
-            all_rows.append(normalize_row(r, pdf_path, p))
-    return all_rows
+    texts = extract_all_pages_text(pdf_path, n)
+    n_ocr = sum(len(t.strip()) < MIN_TEXT_CHARS for t in texts)
+    # header/footer detection only sees native text; OCR'd pages are filtered with the same set
+    boilerplate = boilerplate_lines([t for t in texts if len(t.strip()) >= MIN_TEXT_CHARS])
+    sem = asyncio.Semaphore(n_workers)
+    extract_q, selfcheck_q = asyncio.Queue(), asyncio.Queue()
+    results = {}
+    complete = True  # False if any Gemini reply was unparseable; such PDFs are not cached
+
+    async def produce(pool):
+        # 0) native text, OCR fallback fanned out across cores; chunks go out as soon as they fill
+        async for i, chunk in aenumerate(chunk_pages(page_texts(pdf_path, texts, pool), boilerplate)):
+            await extract_q.put((i, chunk))
+        for _ in range(n_workers):
+            await extract_q.put(None)
+
+    async def extract_worker():
+        # 1) extraction, all pages of a chunk in one prompt
+        nonlocal complete
+        while (job := await extract_q.get()) is not None:
+            i, chunk = job
+            items = parse_json_array(await gemini_extract(chunk, sem))
+            if items is None:
+                complete, items = False, []
+            await selfcheck_q.put((i, chunk, items))
+
+    async def selfcheck_worker():
+        # 2) self-check normalization, one call per chunk
+        nonlocal complete
+        while (job := await selfcheck_q.get()) is not None:
+            i, chunk, items = job
+            checked = items
+            if needs_selfcheck(items):
+                checked = parse_json_array(await gemini_selfcheck(json_dumps(items), chunk, sem))
+                if checked is None:
+                    # keep the unvalidated extraction rather than dropping the chunk
+                    complete, checked = False, items
+            # model output is untrusted: anything that isn't an object is dropped, not crashed on
+            results[i] = [normalize_row(r, pdf_path, chunk[0][0]) for r in checked if isinstance(r, dict)]
+
+    async def extract_stage():
+        async with asyncio.TaskGroup() as tg:
+            for _ in range(n_workers):
+                tg.create_task(extract_worker())
+        for _ in range(n_workers):
+            await selfcheck_q.put(None)
+
+    # fully text-native PDFs (the common case) never create an OCR pool at all
+    all_text_ok = n_ocr == 0
+    with (contextlib.nullcontext() if all_text_ok else
+          ProcessPoolExecutor(max_workers=min(n_ocr, ocr_workers))) as pool:
+        # TaskGroup: if any stage fails, every sibling is cancelled before we return, so no
+        # worker keeps calling Gemini for a PDF whose result is already being thrown away
+        try:
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(produce(pool))
+                tg.create_task(extract_stage())
+                for _ in range(n_workers):
+                    tg.create_task(selfcheck_worker())
+        except ExceptionGroup as eg:
+            err = eg
+            while isinstance(err, ExceptionGroup):
+                err = err.exceptions[0]
+            raise err  # surface the real failure (e.g. the failed CLI command), not the group
+    return [row for i in sorted(results) for row in results[i]], complete
+
+def load_pdf_cache():
+    """abs pdf path -> {mtime_ns, size, model, prompts, rows} from the last sweeps."""
+    try:
+        return json_loads(PDF_CACHE_PATH.read_bytes())
+    except (OSError, ValueError):
+        return {}
+
+def process_pdf(pdf_path, ocr_workers=None, llm_concurrency=None):
+    """(rows, complete); `complete` is False when some Gemini reply could not be parsed."""
+    return run_async(process_pdf_async(pdf_path, ocr_workers, llm_concurrency))
+
+@functools.cache
+def _prompts_hash():
+    return hashlib.blake2b((EXTRACT_SYSTEM + "\0" + SELF_CHECK_SYSTEM).encode("utf-8"), digest_size=16).hexdigest()
+
+def pdf_stamp(pdf_path):
+    """What a cached entry must match: the file itself plus the model and prompts that produced it."""
+    st = os.stat(pdf_path)
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size,
+            "model": GEMINI_MODEL, "prompts": _prompts_hash()}
+
+def cached_rows(cache, pdf_path, stamp):
+    """Stored rows if the PDF, model and prompts still match `stamp`, else None."""
+    hit = cache.get(os.path.abspath(pdf_path))
+    if hit and all(hit.get(k) == v for k, v in stamp.items()):
+        return hit["rows"]
+    return None
 
 def sweep_folder(folder):
     pdfs = [os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(".pdf")]
     grand = []
-    for pdf in pdfs:
-        rows = process_pdf(pdf)
-        append_rows("out/tasks.csv", rows)
-        write_summary_md(os.path.basename(pdf), rows)
-        grand.extend(rows)
+    # unchanged PDFs (see load_pdf_cache) skip OCR + Gemini entirely
+    cache = load_pdf_cache()
+    stamps = {pdf: pdf_stamp(pdf) for pdf in pdfs}
+    hits = {pdf: cached_rows(cache, pdf, stamps[pdf]) for pdf in pdfs}
+    stale = [pdf for pdf in pdfs if hits[pdf] is None]
+    fresh = {}
+    if stale:
+        # one worker per PDF; the cores and Gemini concurrency are split between them so nested
+        # OCR pools and in-flight requests stay at roughly the single-PDF totals
+        cpus = os.cpu_count() or 1
+        n_procs = min(len(stale), cpus)
+        work = functools.partial(process_pdf, ocr_workers=max(1, cpus // n_procs),
+                                 llm_concurrency=max(1, GEMINI_CONCURRENCY // n_procs))
+        with ProcessPoolExecutor(max_workers=n_procs) as ex:
+            futs = {ex.submit(work, pdf): pdf for pdf in stale}
+            for fut in as_completed(futs):
+                pdf = futs[fut]
+                try:
+                    fresh[pdf] = fut.result()
+                except Exception as e:
+                    # one bad PDF must not discard the others; it is retried on the next sweep
+                    print(f"Skipping {pdf}: {e}", file=sys.stderr)
+    pdfs = [pdf for pdf in pdfs if hits[pdf] is not None or pdf in fresh]
+    # all disk writes happen here in the parent, so workers share no state
+    with open("out/tasks.csv", "a", newline="", buffering=1 << 20) as f:
+        writer = csv.writer(f)
+        for pdf in pdfs:
+            if pdf in fresh:
+                rows, complete = fresh[pdf]
+                if complete:
+                    cache[os.path.abspath(pdf)] = {**stamps[pdf], "rows": rows}
+            else:
+                rows = hits[pdf]
+            append_rows(writer, rows)
+            write_summary_md(os.path.basename(pdf), rows)
+            grand.extend(rows)
+    for key in [k for k in cache if not os.path.exists(k)]:
+        del cache[key]  # PDFs deleted since they were cached
+    write_atomic(PDF_CACHE_PATH, json_dumps(cache))
     aggregate_dashboard("out/tasks.csv")
     print(f"Processed {len(pdfs)} PDFs • extracted {len(grand)} follow-up items.")
 
@@ -211,27 +590,25 @@ If a fact is not present, say you cannot find it. Prefer citing source_pdf and p
 Return concise, actionable answers for clinicians."""
 
 def load_context():
-    tasks = []
+    tasks = deque(maxlen=400)  # only the newest rows are used; never hold the whole CSV
     if os.path.exists("out/tasks.csv"):
-        with open("out/tasks.csv") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                tasks.append(row)
+        with open("out/tasks.csv", newline="") as f:
+            tasks.extend(csv.DictReader(f))
     summaries = []
     sdir = pathlib.Path("out/summaries")
     if sdir.exists():
         for p in list(sdir.glob("*.md"))[:50]:
             summaries.append(p.read_text()[:4000])
-    return tasks[-400:], "\n\n".join(summaries)[:12000]
+    return list(tasks), "\n\n".join(summaries)[:12000]
 
 def qa_answer(q):
     rows, summaries = load_context()
-    context_blob = json.dumps(rows)[:12000]
+    context_blob = json_dumps(rows)[:12000]
     prompt = (QA_SYSTEM +
               "\n\nCONTEXT TASK_ROWS (JSON rows):\n" + context_blob +
               "\n\nCONTEXT SUMMARIES (markdown excerpts):\n" + summaries +
               "\n\nUSER QUESTION:\n" + q)
-    out = run([GEMINI_CMD, "-m", GEMINI_MODEL, "-p", prompt])
+    out = run_async(gemini_generate(prompt))
     return out.strip()
 
 def repl():